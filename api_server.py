@@ -4,33 +4,307 @@ Flask API Server for Behavioral Authentication ML Service
 Provides REST endpoints for model training, prediction, and management
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
+import io
 import json
+import msgspec
+import orjson
+import xxhash
 import logging
+import statistics
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime
 import os
-from ml_backend import BehavioralBiometricsML
+from feature_kernels import FEATURE_DIM
+from schemas import BehavioralDataRequest, TrainRequest
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+class JsonFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry).decode()
+
+# Configure logging (force replaces the plain handler installed by ml_backend)
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(JsonFormatter())
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler], force=True)
 logger = logging.getLogger(__name__)
 
+class OrJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, with native NumPy array serialization"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Largest request body accepted, after gzip decompression (default 32 MiB)
+MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+
+# Size of the compressed chunks read from a gzip request body
+GZIP_READ_SIZE = 64 * 1024
+
+class GzipRequestMiddleware:
+    """
+    WSGI middleware that decompresses request bodies sent with Content-Encoding: gzip
+
+    Bodies over max_length bytes, declared or once decompressed, are rejected with 413
+    without being read or inflated in full, so a small gzip bomb cannot exhaust memory.
+    """
+
+    def __init__(self, wsgi_app, max_length):
+        self.wsgi_app = wsgi_app
+        self.max_length = max_length
+
+    def __call__(self, environ, start_response):
+        content_length = environ.get('CONTENT_LENGTH')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_length:
+            return self._error(environ, start_response, "Request body too large", 413)
+        
+        if environ.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+            try:
+                body = self._decompress(get_input_stream(environ, max_content_length=self.max_length))
+            except zlib.error:
+                return self._error(environ, start_response, "Invalid gzip request body", 400)
+            except RequestEntityTooLarge:
+                # A chunked body grew past max_length before it was fully read
+                return self._error(environ, start_response, "Request body too large", 413)
+            if body is None:
+                return self._error(environ, start_response, "Request body too large", 413)
+            
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            environ.pop('HTTP_CONTENT_ENCODING')
+            environ.pop('HTTP_TRANSFER_ENCODING', None)
+        
+        return self.wsgi_app(environ, start_response)
+
+    def _decompress(self, stream):
+        """
+        Inflate a gzip stream, one or more members long
+
+        Returns:
+            The decompressed bytes, or None as soon as they would exceed max_length
+
+        Raises:
+            zlib.error: If the stream is not valid gzip or is truncated
+        """
+        decompressor = zlib.decompressobj(wbits=31)
+        chunks = []
+        size = 0
+        
+        while True:
+            data = stream.read(GZIP_READ_SIZE)
+            if not data:
+                break
+            while data:
+                if decompressor.eof:
+                    decompressor = zlib.decompressobj(wbits=31)
+                # Inflate at most one byte past the limit, so overflow is detected without buffering more
+                chunk = decompressor.decompress(data, self.max_length + 1 - size)
+                size += len(chunk)
+                if size > self.max_length:
+                    return None
+                chunks.append(chunk)
+                data = decompressor.unused_data
+        
+        if not decompressor.eof:
+            raise zlib.error("Truncated gzip stream")
+        return b"".join(chunks)
+
+    @staticmethod
+    def _error(environ, start_response, message, status):
+        """Answer with a JSON error; flask-cors never sees these responses, so add its header here"""
+        response = Response(orjson.dumps({
+            "success": False,
+            "error": message,
+            "timestamp": datetime.now().isoformat()
+        }), status=status, mimetype='application/json')
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        return response(environ, start_response)
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrJSONProvider(app)
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app, MAX_CONTENT_LENGTH)
 CORS(app)  # Enable CORS for all routes
 
-# Initialize ML service
-ml_service = BehavioralBiometricsML()
+# Compress JSON responses larger than COMPRESS_MIN_SIZE bytes
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_ALGORITHM'] = ['gzip', 'deflate']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_DEFLATE_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 500
+Compress(app)
+
+# Small synthetic session touching every feature group, used to warm up the ML service
+_WARMUP_SAMPLE = {
+    "keyEvents": [
+        {"key": "a", "event": "pressed", "epoch": 1000},
+        {"key": "a", "event": "released", "epoch": 1120},
+        {"key": "b", "event": "pressed", "epoch": 1300},
+        {"key": "b", "event": "released", "epoch": 1410}
+    ],
+    "touchEvents": [
+        {"event": "touch", "coordinates": {"x": 100, "y": 200}, "epoch": 1000},
+        {"event": "release", "coordinates": {"x": 120, "y": 230}, "epoch": 1100}
+    ],
+    "sensorData": [
+        {
+            "accelerometer": {"x": 0.1 * i, "y": 0.2, "z": 9.8},
+            "gyroscope": {"x": 0.01, "y": 0.02 * i, "z": 0.0},
+            "magnetometer": {"x": 30.0, "y": 5.0, "z": -40.0 + i}
+        }
+        for i in range(5)
+    ],
+    "sessionDuration": 5000,
+    "typingSpeed": 0.8,
+    "falseEnters": 0
+}
+
+def _warm_up():
+    """Run feature extraction (and prediction, if a model is trained) once before serving"""
+    try:
+        ml_service.extract_features(_WARMUP_SAMPLE)
+        if ml_service.model is not None and ml_service.feature_names:
+            ml_service.predict(_WARMUP_SAMPLE)
+        logger.info("ML service warmed up")
+    except Exception:
+        logger.exception("Error warming up ML service")
+
+# Initialize and warm up the ML service. When this script is run directly, the training feature
+# extraction workers re-import it as __mp_main__; they only need feature_kernels, so they skip
+# TensorFlow and the models (and route handlers, which use ml_service, never run there)
+if __name__ != '__mp_main__':
+    from ml_backend import BehavioralBiometricsML
+    ml_service = BehavioralBiometricsML()
+    _warm_up()
+
+# Feature names reported before a model has been trained, serialized once
+DEFAULT_FEATURE_NAMES_JSON = orjson.Fragment(orjson.dumps([f"feature_{i}" for i in range(FEATURE_DIM)]))
+
+# LRU caches for repeated payloads, keyed by a hash of the canonical JSON
+CACHE_CAPACITY = 4096
+_cache_lock = threading.Lock()
+_prediction_cache = OrderedDict()
+_feature_cache = OrderedDict()
+
+def _payload_key(behavioral_data):
+    """Hash behavioral data independently of key order"""
+    return xxhash.xxh3_64(orjson.dumps(behavioral_data, option=orjson.OPT_SORT_KEYS)).intdigest()
+
+def _cache_get(cache, key):
+    """Return a cached result and mark it as recently used, or None on a miss"""
+    with _cache_lock:
+        result = cache.get(key)
+        if result is not None:
+            cache.move_to_end(key)
+        return result
+
+def _cache_put(cache, key, result):
+    """Store a result, evicting the least recently used entry when full"""
+    with _cache_lock:
+        cache[key] = result
+        if len(cache) > CACHE_CAPACITY:
+            cache.popitem(last=False)
+
+def _clear_prediction_cache():
+    """Drop cached predictions after the model changes"""
+    with _cache_lock:
+        _prediction_cache.clear()
+
+def decode_request(request_type):
+    """
+    Decode and validate the JSON request body in a single msgspec pass
+    
+    Raises:
+        msgspec.DecodeError: If the body is not valid JSON or does not match request_type
+    """
+    return msgspec.json.decode(request.get_data(cache=False), type=request_type)
+
+def invalid_request(error):
+    """Build the 400 response for a body that failed decoding or validation"""
+    return jsonify({
+        "success": False,
+        "error": str(error),
+        "timestamp": g.ts
+    }), 400
+
+# Static error bodies are serialized once; only the timestamp is spliced in per response
+_TIMESTAMP_PLACEHOLDER = "__timestamp__"
+
+def _error_template(message, status):
+    """Pre-serialize an error body, split around its timestamp"""
+    body = orjson.dumps({
+        "success": False,
+        "error": message,
+        "timestamp": _TIMESTAMP_PLACEHOLDER
+    }, option=orjson.OPT_SORT_KEYS)
+    head, tail = body.split(_TIMESTAMP_PLACEHOLDER.encode())
+    return head, tail, status
+
+def static_error(template):
+    """Build a response from a pre-serialized error template"""
+    head, tail, status = template
+    return Response(head + g.ts.encode() + tail, status=status, mimetype='application/json')
+
+_ERR_NO_DATA = _error_template("No data provided", 400)
+_ERR_LENGTH_MISMATCH = _error_template("Training data and labels must have the same length", 400)
+_ERR_TOO_FEW_SAMPLES = _error_template("Need at least 6 training samples (3 legitimate + 3 fraudulent)", 400)
+_ERR_NOT_FOUND = _error_template("Endpoint not found", 404)
+_ERR_INTERNAL = _error_template("Internal server error", 500)
+
+@app.before_request
+def set_request_timestamp():
+    """Format the response timestamp once per request"""
+    g.ts = datetime.now().isoformat()
+
+@app.before_request
+def sync_models():
+    """Pick up models trained or reset by another worker process, dropping predictions made with the old ones"""
+    if ml_service.reload_if_changed():
+        _clear_prediction_cache()
+
+# Serialized health response, rebuilt at most once per 10ms bucket
+HEALTH_CACHE_NS = 10_000_000
+_HEALTH_CACHE = (None, b"")
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "service": "Behavioral Authentication ML API"
-    })
+    global _HEALTH_CACHE
+    bucket = time.monotonic_ns() // HEALTH_CACHE_NS
+    cached_bucket, body = _HEALTH_CACHE
+    if bucket != cached_bucket:
+        body = app.json.dumps({
+            "status": "healthy",
+            "timestamp": g.ts,
+            "service": "Behavioral Authentication ML API"
+        }).encode()
+        _HEALTH_CACHE = (bucket, body)
+    
+    return Response(body, mimetype='application/json')
 
 @app.route('/api/model/info', methods=['GET'])
 def get_model_info():
@@ -40,109 +314,101 @@ def get_model_info():
         return jsonify({
             "success": True,
             "data": info,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         })
     except Exception as e:
-        logger.error(f"Error getting model info: {e}")
+        logger.exception("Error getting model info")
         return jsonify({
             "success": False,
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         }), 500
 
 @app.route('/api/model/train', methods=['POST'])
 def train_model():
     """Train the behavioral authentication model"""
     try:
-        data = request.get_json()
-        
-        if not data or 'training_data' not in data or 'labels' not in data:
-            return jsonify({
-                "success": False,
-                "error": "Missing required fields: training_data and labels",
-                "timestamp": datetime.now().isoformat()
-            }), 400
+        try:
+            data = decode_request(TrainRequest)
+        except msgspec.DecodeError as e:
+            return invalid_request(e)
         
         training_data = data['training_data']
         labels = data['labels']
         
         # Validate data
         if len(training_data) != len(labels):
-            return jsonify({
-                "success": False,
-                "error": "Training data and labels must have the same length",
-                "timestamp": datetime.now().isoformat()
-            }), 400
+            return static_error(_ERR_LENGTH_MISMATCH)
         
         if len(training_data) < 6:
-            return jsonify({
-                "success": False,
-                "error": "Need at least 6 training samples (3 legitimate + 3 fraudulent)",
-                "timestamp": datetime.now().isoformat()
-            }), 400
+            return static_error(_ERR_TOO_FEW_SAMPLES)
         
         # Train model
-        logger.info(f"Starting model training with {len(training_data)} samples")
+        logger.info("Starting model training with %d samples", len(training_data))
         results = ml_service.train_model(training_data, labels)
+        _clear_prediction_cache()
         
         if "error" in results:
             return jsonify({
                 "success": False,
                 "error": results["error"],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": g.ts
             }), 500
         
         return jsonify({
             "success": True,
             "data": results,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         })
         
     except Exception as e:
-        logger.error(f"Error training model: {e}")
+        logger.exception("Error training model")
         return jsonify({
             "success": False,
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         }), 500
 
 @app.route('/api/model/predict', methods=['POST'])
 def predict():
     """Make prediction on new behavioral data"""
     try:
-        data = request.get_json()
-        
-        if not data or 'behavioral_data' not in data:
-            return jsonify({
-                "success": False,
-                "error": "Missing required field: behavioral_data",
-                "timestamp": datetime.now().isoformat()
-            }), 400
+        try:
+            data = decode_request(BehavioralDataRequest)
+        except msgspec.DecodeError as e:
+            return invalid_request(e)
         
         behavioral_data = data['behavioral_data']
         
-        # Make prediction
-        results = ml_service.predict(behavioral_data)
-        
-        if "error" in results:
-            return jsonify({
-                "success": False,
-                "error": results["error"],
-                "timestamp": datetime.now().isoformat()
-            }), 500
+        # Make prediction, reusing the result for a previously seen payload
+        cache_key = _payload_key(behavioral_data)
+        results = _cache_get(_prediction_cache, cache_key)
+        if results is None:
+            results = ml_service.predict_async(behavioral_data).result()
+            
+            if "error" in results:
+                return jsonify({
+                    "success": False,
+                    "error": results["error"],
+                    "timestamp": g.ts
+                }), 500
+            
+            # Cache the prediction without its timestamp, which each response sets afresh
+            results.pop("timestamp", None)
+            _cache_put(_prediction_cache, cache_key, results)
         
         return jsonify({
             "success": True,
-            "data": results,
-            "timestamp": datetime.now().isoformat()
+            "data": {**results, "timestamp": g.ts},
+            "timestamp": g.ts
         })
         
     except Exception as e:
-        logger.error(f"Error making prediction: {e}")
+        logger.exception("Error making prediction")
         return jsonify({
             "success": False,
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         }), 500
 
 @app.route('/api/model/reset', methods=['POST'])
@@ -150,131 +416,82 @@ def reset_model():
     """Reset the trained model"""
     try:
         ml_service.reset_model()
+        _clear_prediction_cache()
         
         return jsonify({
             "success": True,
             "message": "Model reset successfully",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         })
         
     except Exception as e:
-        logger.error(f"Error resetting model: {e}")
+        logger.exception("Error resetting model")
         return jsonify({
             "success": False,
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         }), 500
 
 @app.route('/api/features/extract', methods=['POST'])
 def extract_features():
     """Extract features from behavioral data"""
     try:
-        data = request.get_json()
-        
-        if not data or 'behavioral_data' not in data:
-            return jsonify({
-                "success": False,
-                "error": "Missing required field: behavioral_data",
-                "timestamp": datetime.now().isoformat()
-            }), 400
+        try:
+            data = decode_request(BehavioralDataRequest)
+        except msgspec.DecodeError as e:
+            return invalid_request(e)
         
         behavioral_data = data['behavioral_data']
         
-        # Extract features
-        features = ml_service.extract_features(behavioral_data)
+        # Extract features, reusing the result for a previously seen payload
+        cache_key = _payload_key(behavioral_data)
+        features = _cache_get(_feature_cache, cache_key)
+        if features is None:
+            features = ml_service.extract_features(behavioral_data)
+            _cache_put(_feature_cache, cache_key, features)
         
         return jsonify({
             "success": True,
             "data": {
-                "features": features.tolist(),
+                "features": features,
                 "feature_count": len(features),
-                "feature_names": ml_service.feature_names or [f"feature_{i}" for i in range(len(features))]
+                "feature_names": ml_service.feature_names or DEFAULT_FEATURE_NAMES_JSON
             },
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         })
         
     except Exception as e:
-        logger.error(f"Error extracting features: {e}")
+        logger.exception("Error extracting features")
         return jsonify({
             "success": False,
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         }), 500
 
 @app.route('/api/analysis/risk-assessment', methods=['POST'])
 def risk_assessment():
     """Perform comprehensive risk assessment"""
     try:
-        data = request.get_json()
-        
-        if not data or 'behavioral_data' not in data:
-            return jsonify({
-                "success": False,
-                "error": "Missing required field: behavioral_data",
-                "timestamp": datetime.now().isoformat()
-            }), 400
+        try:
+            data = decode_request(BehavioralDataRequest)
+        except msgspec.DecodeError as e:
+            return invalid_request(e)
         
         behavioral_data = data['behavioral_data']
         
-        # Extract features
-        features = ml_service.extract_features(behavioral_data)
+        # Extract features together with the statistics behind the risk indicators
+        features, stats = ml_service.extract_features_and_stats(behavioral_data)
         
-        # Calculate various risk indicators
+        # Calculate various risk indicators (NaN statistics never exceed a threshold)
         risk_indicators = {
-            "typing_speed_anomaly": False,
-            "sensor_variance_high": False,
-            "touch_pattern_irregular": False,
+            "typing_speed_anomaly": stats["typing_mean_interval"] > 5000,  # More than 5 seconds between key presses
+            "sensor_variance_high": stats["accel_var_max"] > 15,
+            "touch_pattern_irregular": stats["touch_mean_dist"] > 100,  # Unusually large touch movements
             "session_consistency_low": False
         }
         
-        # Analyze typing speed (if available)
-        if 'keyEvents' in behavioral_data and len(behavioral_data['keyEvents']) > 1:
-            key_events = behavioral_data['keyEvents']
-            if len(key_events) >= 2:
-                intervals = []
-                for i in range(1, len(key_events)):
-                    if key_events[i]['event'] == 'pressed' and key_events[i-1]['event'] == 'pressed':
-                        interval = key_events[i]['epoch'] - key_events[i-1]['epoch']
-                        intervals.append(interval)
-                
-                if intervals:
-                    avg_interval = sum(intervals) / len(intervals)
-                    if avg_interval > 5000:  # More than 5 seconds between key presses
-                        risk_indicators["typing_speed_anomaly"] = True
-        
-        # Analyze sensor variance
-        if 'sensorData' in behavioral_data and len(behavioral_data['sensorData']) > 1:
-            sensor_data = behavioral_data['sensorData']
-            acc_x = [s.get('accelerometer', {}).get('x', 0) for s in sensor_data]
-            acc_y = [s.get('accelerometer', {}).get('y', 0) for s in sensor_data]
-            acc_z = [s.get('accelerometer', {}).get('z', 0) for s in sensor_data]
-            
-            if acc_x and acc_y and acc_z:
-                variance_x = sum((x - sum(acc_x)/len(acc_x))**2 for x in acc_x) / len(acc_x)
-                variance_y = sum((y - sum(acc_y)/len(acc_y))**2 for y in acc_y) / len(acc_y)
-                variance_z = sum((z - sum(acc_z)/len(acc_z))**2 for z in acc_z) / len(acc_z)
-                
-                if max(variance_x, variance_y, variance_z) > 15:
-                    risk_indicators["sensor_variance_high"] = True
-        
-        # Analyze touch patterns
-        if 'touchEvents' in behavioral_data and len(behavioral_data['touchEvents']) > 1:
-            touch_events = behavioral_data['touchEvents']
-            movements = []
-            for i in range(1, len(touch_events)):
-                if touch_events[i]['event'] == 'release' and touch_events[i-1]['event'] == 'touch':
-                    dx = touch_events[i]['coordinates']['x'] - touch_events[i-1]['coordinates']['x']
-                    dy = touch_events[i]['coordinates']['y'] - touch_events[i-1]['coordinates']['y']
-                    distance = (dx**2 + dy**2)**0.5
-                    movements.append(distance)
-            
-            if movements:
-                avg_movement = sum(movements) / len(movements)
-                if avg_movement > 100:  # Unusually large touch movements
-                    risk_indicators["touch_pattern_irregular"] = True
-        
         # Overall risk score
-        risk_score = sum(risk_indicators.values()) / len(risk_indicators)
+        risk_score = statistics.fmean(risk_indicators.values())
         
         return jsonify({
             "success": True,
@@ -282,20 +499,37 @@ def risk_assessment():
                 "risk_score": risk_score,
                 "risk_level": "High" if risk_score > 0.5 else "Medium" if risk_score > 0.2 else "Low",
                 "risk_indicators": risk_indicators,
-                "feature_vector": features.tolist(),
-                "timestamp": datetime.now().isoformat()
+                "feature_vector": features,
+                "timestamp": g.ts
             },
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         })
         
     except Exception as e:
-        logger.error(f"Error performing risk assessment: {e}")
+        logger.exception("Error performing risk assessment")
         return jsonify({
             "success": False,
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         }), 500
 
+# Fields every behavioral data submission must contain
+REQUIRED_FIELDS = ('keyEvents', 'touchEvents', 'sensorData')
+_MISSING = object()
+
+# (field, minimum length, warning) for fields that are present but sparse
+SPARSE_FIELD_WARNINGS = (
+    ('keyEvents', 2, "Very few key events detected"),
+    ('sensorData', 5, "Limited sensor data available")
+)
+
+# (field, (length for a full score, length for a half score)) for the data quality score
+QUALITY_SPEC = (
+    ('keyEvents', (5, 2)),
+    ('sensorData', (10, 5)),
+    ('touchEvents', (3, 1))
+)
+
 @app.route('/api/data/validate', methods=['POST'])
 def validate_data():
     """Validate behavioral data format and completeness"""
@@ -303,113 +537,60 @@ def validate_data():
         data = request.get_json()
         
         if not data:
-            return jsonify({
-                "success": False,
-                "error": "No data provided",
-                "timestamp": datetime.now().isoformat()
-            }), 400
+            return static_error(_ERR_NO_DATA)
         
-        validation_results = {
-            "is_valid": True,
-            "errors": [],
-            "warnings": [],
-            "data_quality_score": 0.0
-        }
+        # Look up each field and its length once
+        values = {field: data.get(field, _MISSING) for field in REQUIRED_FIELDS}
+        sizes = {field: 0 if value is _MISSING else len(value) for field, value in values.items()}
+        
+        # Check required fields are present and are lists
+        errors = [f"Missing required field: {field}" for field, value in values.items() if value is _MISSING]
+        errors += [f"{field} must be a list" for field, value in values.items()
+                   if value is not _MISSING and not isinstance(value, list)]
         
-        # Check required fields
-        required_fields = ['keyEvents', 'touchEvents', 'sensorData']
-        for field in required_fields:
-            if field not in data:
-                validation_results["errors"].append(f"Missing required field: {field}")
-                validation_results["is_valid"] = False
-        
-        # Validate key events
-        if 'keyEvents' in data:
-            key_events = data['keyEvents']
-            if not isinstance(key_events, list):
-                validation_results["errors"].append("keyEvents must be a list")
-                validation_results["is_valid"] = False
-            elif len(key_events) < 2:
-                validation_results["warnings"].append("Very few key events detected")
-        
-        # Validate touch events
-        if 'touchEvents' in data:
-            touch_events = data['touchEvents']
-            if not isinstance(touch_events, list):
-                validation_results["errors"].append("touchEvents must be a list")
-                validation_results["is_valid"] = False
-        
-        # Validate sensor data
-        if 'sensorData' in data:
-            sensor_data = data['sensorData']
-            if not isinstance(sensor_data, list):
-                validation_results["errors"].append("sensorData must be a list")
-                validation_results["is_valid"] = False
-            elif len(sensor_data) < 5:
-                validation_results["warnings"].append("Limited sensor data available")
+        warnings = [message for field, minimum, message in SPARSE_FIELD_WARNINGS
+                    if isinstance(values[field], list) and sizes[field] < minimum]
         
         # Calculate data quality score
-        quality_factors = []
-        if 'keyEvents' in data and len(data['keyEvents']) >= 5:
-            quality_factors.append(1.0)
-        elif 'keyEvents' in data and len(data['keyEvents']) >= 2:
-            quality_factors.append(0.5)
-        else:
-            quality_factors.append(0.0)
-        
-        if 'sensorData' in data and len(data['sensorData']) >= 10:
-            quality_factors.append(1.0)
-        elif 'sensorData' in data and len(data['sensorData']) >= 5:
-            quality_factors.append(0.5)
-        else:
-            quality_factors.append(0.0)
-        
-        if 'touchEvents' in data and len(data['touchEvents']) >= 3:
-            quality_factors.append(1.0)
-        elif 'touchEvents' in data and len(data['touchEvents']) >= 1:
-            quality_factors.append(0.5)
-        else:
-            quality_factors.append(0.0)
-        
-        validation_results["data_quality_score"] = sum(quality_factors) / len(quality_factors)
+        quality_factors = [1.0 if sizes[field] >= full else 0.5 if sizes[field] >= half else 0.0
+                           for field, (full, half) in QUALITY_SPEC]
+        
+        validation_results = {
+            "is_valid": not errors,
+            "errors": errors,
+            "warnings": warnings,
+            "data_quality_score": statistics.fmean(quality_factors)
+        }
         
         return jsonify({
             "success": True,
             "data": validation_results,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         })
         
     except Exception as e:
-        logger.error(f"Error validating data: {e}")
+        logger.exception("Error validating data")
         return jsonify({
             "success": False,
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": g.ts
         }), 500
 
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
-    return jsonify({
-        "success": False,
-        "error": "Endpoint not found",
-        "timestamp": datetime.now().isoformat()
-    }), 404
+    return static_error(_ERR_NOT_FOUND)
 
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
-    return jsonify({
-        "success": False,
-        "error": "Internal server error",
-        "timestamp": datetime.now().isoformat()
-    }), 500
+    return static_error(_ERR_INTERNAL)
 
 if __name__ == '__main__':
     # Get port from environment variable or use default
     port = int(os.environ.get('PORT', 5123))
     
-    logger.info(f"Starting Behavioral Authentication ML API server on port {port}")
+    logger.info("Starting Behavioral Authentication ML API server on port %d", port)
     logger.info("Available endpoints:")
     logger.info("  GET  /health - Health check")
     logger.info("  GET  /api/model/info - Get model information")
@@ -420,5 +601,5 @@ if __name__ == '__main__':
     logger.info("  POST /api/analysis/risk-assessment - Risk assessment")
     logger.info("  POST /api/data/validate - Validate data")
     
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # Run the Flask development server; use gunicorn.conf.py for production serving
+    app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Request Batching Scheduler
+Coalesces concurrent single-item requests into batched calls
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+
+# Queued by close() to stop the worker thread
+_STOP = object()
+
+
+class _BatchItem:
+    """A single submitted request waiting for its batched result"""
+
+    __slots__ = ("data", "future")
+
+    def __init__(self, data: Any):
+        self.data = data
+        self.future = Future()
+
+
+class BatchScheduler:
+    """
+    Dispatches requests that queued up while the previous batch was running as one call
+
+    A lone request is dispatched immediately; batches only form under load,
+    so batching never adds latency of its own.
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_enqueued_batches: int = 100):
+        """
+        Args:
+            handler: Function mapping a list of inputs to a list of results in the same order
+            max_batch_size: Largest number of requests dispatched in a single call
+            max_enqueued_batches: Queue bound, in batches, before submitters block
+        """
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue(maxsize=max_batch_size * max_enqueued_batches)
+
+        # The worker thread is started by the first submission and stopped by close();
+        # while it runs it keeps the scheduler (and its handler's owner) alive
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._closed = False
+        self._stopping = False
+
+    def submit(self, data: Any) -> Any:
+        """
+        Submit a single input and block until its batch has been processed
+
+        Args:
+            data: Input passed to the handler as part of a batch
+
+        Returns:
+            The handler's result for this input
+        """
+        return self.submit_async(data).result()
+
+    def submit_async(self, data: Any) -> Future:
+        """
+        Submit a single input without waiting for its batch
+
+        Args:
+            data: Input passed to the handler as part of a batch
+
+        Returns:
+            Future resolving to the handler's result for this input
+
+        Raises:
+            RuntimeError: If the scheduler has been closed
+        """
+        item = _BatchItem(data)
+        with self._worker_lock:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is closed")
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="batch-worker", daemon=True)
+                self._worker.start()
+            self._queue.put(item)
+        return item.future
+
+    def close(self):
+        """Stop the worker thread once queued requests are done; later submissions raise RuntimeError"""
+        with self._worker_lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+
+        # Nothing can be queued after the stop marker, so every pending request is still answered
+        if worker is not None:
+            self._queue.put(_STOP)
+            worker.join()
+
+    def _drain_queue(self) -> List[_BatchItem]:
+        """Wait for one item, then collect up to max_batch_size - 1 more that are already queued"""
+        items = []
+
+        while len(items) < self.max_batch_size:
+            try:
+                item = self._queue.get(block=not items)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._stopping = True
+                break
+            items.append(item)
+
+        return items
+
+    def _run(self):
+        """Worker loop: drain a batch, run the handler, hand results back to waiters"""
+        while not self._stopping:
+            items = self._drain_queue()
+            if not items:
+                continue
+            try:
+                results = self.handler([item.data for item in items])
+            except Exception as e:
+                for item in items:
+                    item.future.set_exception(e)
+            else:
+                for item, result in zip(items, results):
+                    item.future.set_result(result)
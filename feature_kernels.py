@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Feature Extraction
+Builds the behavioral feature vector with Numba kernels; kept free of TensorFlow
+so processes that only extract features start quickly
+"""
+
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+from numba import njit
+
+logger = logging.getLogger(__name__)
+
+# Length of the vector produced by extract_features:
+# 14 key timing + 4 touch + 36 sensor + 3 session features
+FEATURE_DIM = 57
+
+# Version of the feature definitions; bump it whenever extract_features changes what it
+# computes, so feature vectors cached by earlier versions are discarded
+FEATURE_VERSION = 2
+
+# Sensors that contribute features only when present in the session's sensor samples
+OPTIONAL_SENSORS = ('gyroscope', 'magnetometer')
+
+# Order of the 12-feature sensor blocks in the feature vector
+SENSORS = ('accelerometer',) + OPTIONAL_SENSORS
+
+# Integer codes for key and touch events, so the kernels stay in nopython mode
+KEY_EVENT_CODES = {"pressed": 1, "released": 2}
+TOUCH_EVENT_CODES = {"touch": 1, "release": 2}
+PRESSED = 1
+RELEASED = 2
+TOUCH = 1
+RELEASE = 2
+
+# Offsets of each feature group within the feature vector
+KEY_OFFSET = 0
+TOUCH_OFFSET = 14
+SENSOR_OFFSET = 18
+SENSOR_WIDTH = 12
+
+# Positions of the summary statistics written by compute_features
+TYPING_MEAN_INTERVAL = 0
+ACCEL_VAR_MAX = 1
+TOUCH_MEAN_DIST = 2
+
+
+@njit(fastmath=True, cache=True, nogil=True)
+def _summarize(values, out, offset):
+    """Write mean, std, min and max of a non-empty array to out[offset:offset + 4]"""
+    n = values.shape[0]
+    total = 0.0
+    low = values[0]
+    high = values[0]
+    for i in range(n):
+        total += values[i]
+        if values[i] < low:
+            low = values[i]
+        if values[i] > high:
+            high = values[i]
+    mean = total / n
+
+    variance = 0.0
+    for i in range(n):
+        d = values[i] - mean
+        variance += d * d
+
+    out[offset] = mean
+    out[offset + 1] = np.sqrt(variance / n)
+    out[offset + 2] = low
+    out[offset + 3] = high
+
+
+@njit(fastmath=True, cache=True, nogil=True)
+def _quartiles(values, out, offset):
+    """Write the 25th and 75th percentiles of a non-empty array to out[offset:offset + 2], as np.percentile does"""
+    last = values.shape[0] - 1
+    q1 = 0.25 * last
+    q3 = 0.75 * last
+    lo1 = int(q1)
+    lo3 = int(q3)
+    hi1 = min(lo1 + 1, last)
+    hi3 = min(lo3 + 1, last)
+
+    # One selection pass places all four neighbouring order statistics
+    parts = np.partition(values, np.array([lo1, hi1, lo3, hi3]))
+    out[offset] = parts[lo1] + (parts[hi1] - parts[lo1]) * (q1 - lo1)
+    out[offset + 1] = parts[lo3] + (parts[hi3] - parts[lo3]) * (q3 - lo3)
+
+
+@njit(fastmath=True, cache=True, nogil=True)
+def compute_features(epochs, key_codes, touch_x, touch_y, touch_codes, readings, sensor_slots, out, stats):
+    """
+    Fill the key, touch and sensor sections of a zeroed feature vector
+
+    Summary statistics are written to stats only when they are available,
+    so entries the caller pre-filled (with NaN) are left untouched otherwise.
+    """
+    # Key timing: dwell (press -> release), flight (release -> press) and press-to-press gaps
+    n = epochs.shape[0]
+    if n > 1:
+        dwell = np.empty(n - 1)
+        flight = np.empty(n - 1)
+        press_gaps = np.empty(n - 1)
+        press_times = np.empty(n)
+        n_dwell = 0
+        n_flight = 0
+        n_press_gaps = 0
+        n_presses = 0
+        for i in range(n):
+            if key_codes[i] == PRESSED:
+                press_times[n_presses] = epochs[i]
+                n_presses += 1
+            if i == 0:
+                continue
+
+            gap = epochs[i] - epochs[i - 1]
+            if key_codes[i - 1] == PRESSED and key_codes[i] == RELEASED:
+                dwell[n_dwell] = gap
+                n_dwell += 1
+            elif key_codes[i - 1] == PRESSED and key_codes[i] == PRESSED:
+                press_gaps[n_press_gaps] = gap
+                n_press_gaps += 1
+            elif key_codes[i - 1] == RELEASED and key_codes[i] == PRESSED:
+                flight[n_flight] = gap
+                n_flight += 1
+
+        if n_press_gaps:
+            stats[TYPING_MEAN_INTERVAL] = press_gaps[:n_press_gaps].mean()
+
+        if n_dwell:
+            _summarize(dwell[:n_dwell], out, KEY_OFFSET)
+            _quartiles(dwell[:n_dwell], out, KEY_OFFSET + 4)
+
+        if n_flight:
+            _summarize(flight[:n_flight], out, KEY_OFFSET + 6)
+
+        if n_presses > 1:
+            _summarize(np.diff(press_times[:n_presses]), out, KEY_OFFSET + 10)
+
+    # Touch movement between each touch and the release that follows it
+    n = touch_x.shape[0]
+    if n > 1:
+        movements = np.empty(n - 1)
+        n_movements = 0
+        for i in range(1, n):
+            if touch_codes[i - 1] == TOUCH and touch_codes[i] == RELEASE:
+                dx = touch_x[i] - touch_x[i - 1]
+                dy = touch_y[i] - touch_y[i - 1]
+                movements[n_movements] = np.sqrt(dx * dx + dy * dy)
+                n_movements += 1
+
+        if n_movements:
+            _summarize(movements[:n_movements], out, TOUCH_OFFSET)
+            stats[TOUCH_MEAN_DIST] = out[TOUCH_OFFSET]
+
+    # Sensors: mean/std/min/max of each x/y/z column, 12 features per sensor slot
+    if readings.shape[0] > 1:
+        for column in range(readings.shape[1]):
+            offset = SENSOR_OFFSET + sensor_slots[column // 3] * SENSOR_WIDTH + (column % 3) * 4
+            _summarize(readings[:, column], out, offset)
+
+        # The accelerometer always occupies the first three columns and slot 0
+        variance = 0.0
+        for axis in range(3):
+            std = out[SENSOR_OFFSET + axis * 4 + 1]
+            if std * std > variance:
+                variance = std * std
+        stats[ACCEL_VAR_MAX] = variance
+
+
+def extract_features_and_stats(behavioral_data: Dict) -> Tuple[np.ndarray, Dict]:
+    """
+    Extract features and the summary statistics used for risk indicators in one pass
+
+    Args:
+        behavioral_data: Dictionary containing behavioral data
+
+    Returns:
+        Tuple of the feature vector and a dictionary of statistics
+        (typing_mean_interval, accel_var_max, touch_mean_dist), NaN where unavailable
+    """
+    stats = {
+        "typing_mean_interval": np.nan,
+        "accel_var_max": np.nan,
+        "touch_mean_dist": np.nan
+    }
+
+    try:
+        # Key events as epochs plus integer event codes
+        key_events = behavioral_data.get('keyEvents') or []
+        n_key_events = len(key_events)
+        epochs = np.fromiter((e['epoch'] for e in key_events), dtype=np.float64, count=n_key_events)
+        key_codes = np.fromiter(
+            (KEY_EVENT_CODES.get(e['event'], 0) for e in key_events),
+            dtype=np.int8,
+            count=n_key_events
+        )
+
+        # Touch events as coordinate columns plus integer event codes
+        touch_events = behavioral_data.get('touchEvents') or []
+        n_touch_events = len(touch_events)
+        touch_x = np.fromiter((t['coordinates']['x'] for t in touch_events), dtype=np.float64, count=n_touch_events)
+        touch_y = np.fromiter((t['coordinates']['y'] for t in touch_events), dtype=np.float64, count=n_touch_events)
+        touch_codes = np.fromiter(
+            (TOUCH_EVENT_CODES.get(t['event'], 0) for t in touch_events),
+            dtype=np.int8,
+            count=n_touch_events
+        )
+
+        # Sensor samples as an (N, 3 * sensors) array of x/y/z columns
+        sensor_data = behavioral_data.get('sensorData') or []
+        n_sensor_samples = len(sensor_data)
+        if n_sensor_samples > 1:
+            # Accelerometer, plus gyroscope/magnetometer when the first sample has them
+            sensors = ['accelerometer'] + [name for name in OPTIONAL_SENSORS if name in sensor_data[0]]
+            sensor_slots = np.array([SENSORS.index(name) for name in sensors], dtype=np.int64)
+            readings = np.fromiter(
+                (sample[name][axis] for sample in sensor_data for name in sensors for axis in ('x', 'y', 'z')),
+                dtype=np.float64,
+                count=n_sensor_samples * 3 * len(sensors)
+            ).reshape(n_sensor_samples, 3 * len(sensors))
+        else:
+            sensor_slots = np.zeros(1, dtype=np.int64)
+            readings = np.empty((0, 3), dtype=np.float64)
+
+        # Key, touch and sensor statistics in one compiled pass
+        features = np.zeros(FEATURE_DIM, dtype=np.float64)
+        stat_values = np.full(3, np.nan)
+        compute_features(
+            epochs, key_codes, touch_x, touch_y, touch_codes, readings, sensor_slots, features, stat_values
+        )
+        stats["typing_mean_interval"] = float(stat_values[TYPING_MEAN_INTERVAL])
+        stats["accel_var_max"] = float(stat_values[ACCEL_VAR_MAX])
+        stats["touch_mean_dist"] = float(stat_values[TOUCH_MEAN_DIST])
+
+        # Session features
+        features[-3:] = [
+            behavioral_data.get('sessionDuration', 0),
+            behavioral_data.get('typingSpeed', 0),
+            behavioral_data.get('falseEnters', 0)
+        ]
+
+        # Handle NaN values
+        np.nan_to_num(features, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+        return features, stats
+
+    except Exception as e:
+        logger.exception("Error extracting features")
+        # Return zero features if extraction fails
+        return np.zeros(FEATURE_DIM), stats
+
+
+def extract_features(behavioral_data: Dict) -> np.ndarray:
+    """Extract the feature vector alone (see extract_features_and_stats)"""
+    return extract_features_and_stats(behavioral_data)[0]
+
+
+def precompile():
+    """Compile (or load from the on-disk cache) the kernel for the dtypes the ML backend passes in"""
+    compute_features(
+        np.zeros(2, dtype=np.float64), np.zeros(2, dtype=np.int8),
+        np.zeros(2, dtype=np.float64), np.zeros(2, dtype=np.float64), np.zeros(2, dtype=np.int8),
+        np.zeros((2, 3), dtype=np.float64), np.zeros(1, dtype=np.int64),
+        np.zeros(FEATURE_DIM, dtype=np.float64), np.zeros(3, dtype=np.float64)
+    )
+
+
+precompile()
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for the Behavioral Authentication ML API
+Run with: gunicorn -c gunicorn.conf.py api_server:app
+
+Every worker process holds its own copy of the models. Training or resetting in one worker
+rewrites the model directory and its generation marker; the other workers notice the new
+marker on their next request and reload, so for a moment they may still answer with the
+previous models. Concurrent trainings in two workers are serialized when saving, and the
+last one to finish wins.
+"""
+
+import multiprocessing
+import os
+
+# Bind to the same port as the development server
+bind = f"0.0.0.0:{os.environ.get('PORT', 5123)}"
+
+# One worker process per core, each handling requests on a small thread pool
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = 4
+
+# Split the cores between the workers, rather than letting every worker's TensorFlow and
+# BLAS thread pools size themselves to the whole host (workers inherit this environment)
+_threads_per_worker = str(max(1, multiprocessing.cpu_count() // workers))
+for _variable in ('TF_NUM_INTRAOP_THREADS', 'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(_variable, _threads_per_worker)
+os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+
+# Each worker imports the app and loads the models itself: TensorFlow's runtime is not
+# fork-safe once initialised, so a preloaded model deadlocks on first use in a worker
+preload_app = False
@@ -5,19 +5,31 @@ Advanced machine learning backend for behavioral biometrics and fraud detection
 """
 
 import os
-import json
+import fcntl
+import hashlib
 import numpy as np
+import orjson
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 import logging
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import feature_kernels
+from feature_kernels import FEATURE_DIM, FEATURE_VERSION, OPTIONAL_SENSORS, SENSORS
+from batch_scheduler import BatchScheduler
 
 # ML Libraries
 try:
     import tensorflow as tf
     from tensorflow import keras
     from tensorflow.keras import layers, models
-    from sklearn.ensemble import RandomForestClassifier, IsolationForest
+    from sklearn.ensemble import RandomForestClassifier
     from sklearn.preprocessing import StandardScaler, MinMaxScaler
     from sklearn.model_selection import train_test_split, cross_val_score
     from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
@@ -32,6 +44,68 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Training sets at least this large have their features extracted in a process pool,
+# handing samples to the workers this many at a time (starting the pool's fork server and
+# workers takes seconds, about as long as extracting tens of thousands of samples serially)
+PARALLEL_EXTRACTION_MIN_SAMPLES = 32768
+PARALLEL_EXTRACTION_CHUNK_SIZE = 64
+
+# joblib compression for the pickled scaler, PCA and anomaly detector
+MODEL_COMPRESSION = ('lz4', 3)
+
+# High-anomaly cut for saved detectors without a calibrated one (the isolation forest,
+# whose decision_function stays within about [-0.5, 0.5])
+LEGACY_HIGH_ANOMALY_SCORE = -0.5
+
+# Number of training feature vectors kept in the content-addressed feature cache
+FEATURE_CACHE_CAPACITY = 65536
+
+# Files in the model directory coordinating processes that share it: the generation marker is
+# rewritten after every save or reset, and the lock file is flock()ed around reads and writes
+MODEL_GENERATION_FILE = "generation"
+MODEL_LOCK_FILE = ".lock"
+
+class MahalanobisDetector:
+    """
+    One-class anomaly detector scoring samples by Mahalanobis distance from the training data
+    
+    decision_function follows IsolationForest's convention: negative for anomalies,
+    zero at the boundary calibrated so a `contamination` share of training samples fall outside it.
+    """
+    
+    def __init__(self, contamination: float = 0.1, high_anomaly_quantile: float = 0.99):
+        self.contamination = contamination
+        self.high_anomaly_quantile = high_anomaly_quantile
+        self.mean_ = None
+        self.precision_ = None
+        self.threshold_ = None
+        self.high_anomaly_score_ = None
+    
+    def fit(self, X: np.ndarray) -> "MahalanobisDetector":
+        """
+        Estimate the mean and inverse covariance of X and calibrate the anomaly boundary,
+        plus the (non-positive) score only a 1 - high_anomaly_quantile share of X falls below
+        """
+        self.mean_ = X.mean(axis=0).astype(np.float32)
+        self.precision_ = np.linalg.pinv(np.atleast_2d(np.cov(X, rowvar=False))).astype(np.float32)
+        distances = self._squared_distances(X)
+        self.threshold_ = max(float(np.quantile(distances, 1 - self.contamination)), 1e-12)
+        self.high_anomaly_score_ = min(1.0 - float(np.quantile(distances, self.high_anomaly_quantile)) / self.threshold_, 0.0)
+        return self
+    
+    def _squared_distances(self, X: np.ndarray) -> np.ndarray:
+        """Squared Mahalanobis distance of each row from the training mean"""
+        d = X - self.mean_
+        return ((d @ self.precision_) * d).sum(axis=1)
+    
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Relative distance inside the boundary: 1 at the mean, 0 on it, -0.5 at 1.5x its squared distance"""
+        return 1.0 - self._squared_distances(X) / self.threshold_
+    
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """-1 for anomalies and 1 for inliers"""
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
 class BehavioralBiometricsML:
     """
     Advanced ML service for behavioral biometrics analysis
@@ -42,9 +116,38 @@ class BehavioralBiometricsML:
         self.scaler = None
         self.pca = None
         self.model = None
-        self.isolation_forest = None
+        self.interpreter = None
+        self.anomaly_detector = None
         self.feature_names = None
         
+        # Fitted scaler and PCA parameters, applied directly in predict_batch
+        self._scaler_mean = None
+        self._scaler_scale = None
+        self._pca_mean = None
+        self._pca_components = None
+        
+        # LRU of extracted training feature vectors, keyed by a digest of the sample; concurrent
+        # trainings, saves and reloads touch it, so every access holds the lock
+        self._feature_cache = OrderedDict()
+        self._feature_cache_lock = threading.Lock()
+        
+        # TFLite interpreters are not thread-safe; batch workers share this one
+        self._interpreter_lock = threading.Lock()
+        
+        # XLA-compiled forward pass, and the Keras model it was traced from
+        self._infer = None
+        self._infer_model = None
+        
+        # Held while predicting and while swapping in models saved by another process
+        self._models_lock = threading.RLock()
+        
+        # Generation marker of the saved models currently loaded
+        self._generation = None
+        
+        # Coalesces concurrent predict_async calls into batched predictions
+        # (its thread starts on the first call; close() stops it)
+        self._prediction_batcher = BatchScheduler(self._predict_data_batch, max_batch_size=32)
+        
         # Create model directory if it doesn't exist
         os.makedirs(model_dir, exist_ok=True)
         
@@ -59,49 +162,53 @@ class BehavioralBiometricsML:
             
         try:
             # Load existing models if available
-            self._load_models()
+            with self._model_dir_lock(exclusive=False):
+                self._load_models()
+                self._generation = self._model_generation()
         except Exception as e:
-            logger.info(f"No existing models found, creating new ones: {e}")
+            logger.info("No existing models found, creating new ones: %s", e)
             self._create_models()
     
     def _create_models(self):
         """Create new ML models"""
         if not ML_AVAILABLE:
             return
-            
+        
+        self.scaler, self.pca, self.model, self.anomaly_detector = self._new_models()
+        self._cache_transform_params()
+    
+    def _new_models(self) -> Tuple:
+        """Unfitted scaler, PCA, neural network and anomaly detector"""
         # Feature scaler
-        self.scaler = StandardScaler()
+        scaler = StandardScaler()
         
         # PCA for dimensionality reduction
-        self.pca = PCA(n_components=0.95)  # Keep 95% variance
+        # Keep 95% variance; with few features and many samples, eigendecomposing the
+        # covariance matrix is much cheaper than an SVD of the whole training set
+        pca = PCA(n_components=0.95, svd_solver='covariance_eigh')
         
         # Neural network model
-        self.model = self._build_neural_network()
+        model = self._build_neural_network()
         
-        # Isolation Forest for anomaly detection
-        self.isolation_forest = IsolationForest(
-            contamination=0.1,
-            random_state=42,
-            n_estimators=100
-        )
+        # Mahalanobis distance in PCA space for anomaly detection
+        anomaly_detector = MahalanobisDetector(contamination=0.1)
+        
+        return scaler, pca, model, anomaly_detector
     
     def _build_neural_network(self) -> keras.Model:
         """Build neural network architecture"""
+        # The input width is the PCA output size, so the model is built on its first fit
         model = keras.Sequential([
-            layers.Dense(256, activation='relu', input_shape=(None,), name='input_layer'),
-            layers.Dropout(0.3),
-            layers.Dense(128, activation='relu', name='hidden_1'),
-            layers.Dropout(0.2),
-            layers.Dense(64, activation='relu', name='hidden_2'),
+            layers.Dense(64, activation='relu', name='hidden_1'),
             layers.Dropout(0.2),
-            layers.Dense(32, activation='relu', name='hidden_3'),
+            layers.Dense(16, activation='relu', name='hidden_2'),
             layers.Dense(1, activation='sigmoid', name='output_layer')
         ])
         
         model.compile(
             optimizer=keras.optimizers.Adam(learning_rate=0.001),
             loss='binary_crossentropy',
-            metrics=['accuracy', 'precision', 'recall']
+            metrics=['accuracy', keras.metrics.Precision(name='precision'), keras.metrics.Recall(name='recall')]
         )
         
         return model
@@ -120,58 +227,235 @@ class BehavioralBiometricsML:
             if os.path.exists(f"{self.model_dir}/pca.pkl"):
                 self.pca = joblib.load(f"{self.model_dir}/pca.pkl")
             
+            self._cache_transform_params()
+            
             # Load neural network
             if os.path.exists(f"{self.model_dir}/neural_network.h5"):
                 self.model = keras.models.load_model(f"{self.model_dir}/neural_network.h5")
             
-            # Load isolation forest
-            if os.path.exists(f"{self.model_dir}/isolation_forest.pkl"):
-                self.isolation_forest = joblib.load(f"{self.model_dir}/isolation_forest.pkl")
+            # Load TFLite version of the neural network used for inference
+            if os.path.exists(f"{self.model_dir}/neural_network.tflite"):
+                self._load_interpreter()
+            
+            # Load anomaly detector (models saved before it replaced the isolation forest
+            # keep theirs, which has the same decision_function convention)
+            if os.path.exists(f"{self.model_dir}/anomaly_detector.pkl"):
+                self.anomaly_detector = joblib.load(f"{self.model_dir}/anomaly_detector.pkl")
+            elif os.path.exists(f"{self.model_dir}/isolation_forest.pkl"):
+                self.anomaly_detector = joblib.load(f"{self.model_dir}/isolation_forest.pkl")
             
             # Load feature names
             if os.path.exists(f"{self.model_dir}/feature_names.json"):
-                with open(f"{self.model_dir}/feature_names.json", 'r') as f:
-                    self.feature_names = json.load(f)
+                with open(f"{self.model_dir}/feature_names.json", 'rb') as f:
+                    self.feature_names = orjson.loads(f.read())
+            
+            # Load cached training features, unless an older extractor produced them
+            if os.path.exists(f"{self.model_dir}/features_cache.npz"):
+                with np.load(f"{self.model_dir}/features_cache.npz") as cache:
+                    keys, rows = cache['keys'], cache['features']
+                    if 'version' in cache and int(cache['version']) == FEATURE_VERSION \
+                            and int(cache['feature_dim']) == FEATURE_DIM \
+                            and keys.shape == (len(rows), 16) and rows.shape[1:] == (FEATURE_DIM,):
+                        feature_cache = OrderedDict((key.tobytes(), row) for key, row in zip(keys, rows))
+                        with self._feature_cache_lock:
+                            self._feature_cache = feature_cache
+                    else:
+                        logger.info("Discarding training features cached by another feature version, or inconsistent")
                     
             logger.info("Models loaded successfully")
             
         except Exception as e:
-            logger.error(f"Error loading models: {e}")
+            logger.exception("Error loading models")
             self._create_models()
     
-    def _save_models(self):
-        """Save trained models"""
+    @contextmanager
+    def _model_dir_lock(self, exclusive: bool):
+        """flock the model directory: shared while loading, exclusive while saving or removing"""
+        with open(os.path.join(self.model_dir, MODEL_LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _model_generation(self) -> Optional[Tuple[int, int]]:
+        """Identity of the generation marker (inode and mtime), or None if it has never been written"""
+        try:
+            marker = os.stat(os.path.join(self.model_dir, MODEL_GENERATION_FILE))
+        except FileNotFoundError:
+            return None
+        return marker.st_ino, marker.st_mtime_ns
+    
+    def _mark_models_changed(self):
+        """Replace the generation marker, so other processes reload; call with the exclusive lock held"""
+        marker_path = os.path.join(self.model_dir, MODEL_GENERATION_FILE)
+        with open(f"{marker_path}.tmp", 'w') as f:
+            f.write(str(time.time_ns()))
+        os.replace(f"{marker_path}.tmp", marker_path)
+        self._generation = self._model_generation()
+    
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the models if another process has saved or reset them since they were loaded
+        
+        Returns:
+            True if the models were reloaded
+        """
+        if self._model_generation() == self._generation:
+            return False
+        
+        with self._models_lock, self._model_dir_lock(exclusive=False):
+            generation = self._model_generation()
+            if generation == self._generation:
+                return False
+            
+            self._clear_models()
+            if ML_AVAILABLE:
+                self._load_models()
+            self._generation = generation
+        
+        logger.info("Reloaded models saved by another process")
+        return True
+    
+    def _save_models(self) -> bool:
+        """
+        Save trained models
+        
+        Returns:
+            Whether every model was written; only then are other processes told to reload
+        """
         if not ML_AVAILABLE:
-            return
-            
+            return False
+        
+        with self._model_dir_lock(exclusive=True):
+            if not self._write_models():
+                return False
+            self._mark_models_changed()
+            return True
+    
+    def _write_models(self) -> bool:
+        """Write every trained model to the model directory, returning whether all writes succeeded"""
         try:
+            # Remove the previous TFLite conversion before anything else is replaced, so a save
+            # failing at any step never leaves a .tflite of the old network beside the new files
+            # (without one, the Keras model in neural_network.h5 is served)
+            tflite_path = f"{self.model_dir}/neural_network.tflite"
+            if os.path.exists(tflite_path):
+                os.remove(tflite_path)
+            
             # Save scaler
             if self.scaler:
-                joblib.dump(self.scaler, f"{self.model_dir}/scaler.pkl")
+                joblib.dump(self.scaler, f"{self.model_dir}/scaler.pkl", compress=MODEL_COMPRESSION)
             
             # Save PCA
             if self.pca:
-                joblib.dump(self.pca, f"{self.model_dir}/pca.pkl")
+                joblib.dump(self.pca, f"{self.model_dir}/pca.pkl", compress=MODEL_COMPRESSION)
             
             # Save neural network
             if self.model:
                 self.model.save(f"{self.model_dir}/neural_network.h5")
             
-            # Save isolation forest
-            if self.isolation_forest:
-                joblib.dump(self.isolation_forest, f"{self.model_dir}/isolation_forest.pkl")
+            # Save anomaly detector
+            if self.anomaly_detector:
+                joblib.dump(self.anomaly_detector, f"{self.model_dir}/anomaly_detector.pkl", compress=MODEL_COMPRESSION)
             
             # Save feature names
             if self.feature_names:
-                with open(f"{self.model_dir}/feature_names.json", 'w') as f:
-                    json.dump(self.feature_names, f)
+                with open(f"{self.model_dir}/feature_names.json", 'wb') as f:
+                    f.write(orjson.dumps(self.feature_names))
+            
+            # Save cached training features, so retraining on the same samples skips extraction
+            # (from one snapshot, so every digest stays beside its own feature row)
+            with self._feature_cache_lock:
+                cached = list(self._feature_cache.items())
+            if cached:
+                keys, rows = zip(*cached)
+                np.savez(
+                    f"{self.model_dir}/features_cache.npz",
+                    keys=np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, 16),
+                    features=np.stack(rows),
+                    version=FEATURE_VERSION,
+                    feature_dim=FEATURE_DIM
+                )
+            
+            # Convert the neural network to TFLite and serve predictions from it
+            self.interpreter = None
+            if self.model:
+                converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                # float16 weights: int8 kernels are slower than float32 on x86 CPUs
+                converter.target_spec.supported_types = [tf.float16]
+                tflite_model = converter.convert()
+                with open(f"{tflite_path}.tmp", 'wb') as f:
+                    f.write(tflite_model)
+                os.replace(f"{tflite_path}.tmp", tflite_path)
+                self._load_interpreter()
                     
             logger.info("Models saved successfully")
+            return True
             
         except Exception as e:
-            logger.error(f"Error saving models: {e}")
+            logger.exception("Error saving models")
+            return False
+    
+    def _cache_transform_params(self):
+        """Keep the fitted scaler and PCA parameters as float32 arrays, or None until both are fitted"""
+        if hasattr(self.scaler, 'mean_') and hasattr(self.pca, 'components_'):
+            self._scaler_mean = self.scaler.mean_.astype(np.float32)
+            self._scaler_scale = self.scaler.scale_.astype(np.float32)
+            self._pca_mean = self.pca.mean_.astype(np.float32)
+            self._pca_components = self.pca.components_.astype(np.float32)
+        else:
+            self._scaler_mean = self._scaler_scale = self._pca_mean = self._pca_components = None
+    
+    def _transform(self, features: np.ndarray) -> np.ndarray:
+        """Scale and project features, as scaler.transform followed by pca.transform"""
+        if self._pca_components is None:
+            return self.pca.transform(self.scaler.transform(features))
+        
+        x = (features.astype(np.float32) - self._scaler_mean) / self._scaler_scale
+        return (x - self._pca_mean) @ self._pca_components.T
+    
+    def _load_interpreter(self):
+        """Load the TFLite neural network and allocate its tensors"""
+        interpreter = tf.lite.Interpreter(model_path=f"{self.model_dir}/neural_network.tflite")
+        interpreter.allocate_tensors()
+        self._input_index = interpreter.get_input_details()[0]['index']
+        self._output_index = interpreter.get_output_details()[0]['index']
+        self.interpreter = interpreter
     
-    def extract_features(self, behavioral_data: Dict) -> np.ndarray:
+    def _inference_function(self):
+        """XLA-compiled forward pass of the Keras model, retraced when the model is replaced"""
+        model = self.model
+        if self._infer_model is not model:
+            self._infer = tf.function(
+                lambda x: model(x, training=False),
+                jit_compile=True,
+                input_signature=[tf.TensorSpec([None, model.input_shape[-1]], tf.float32)]
+            )
+            self._infer_model = model
+        
+        return self._infer
+    
+    def _predict_probabilities(self, features_pca: np.ndarray) -> np.ndarray:
+        """Neural network output for each row, from the TFLite interpreter when one is loaded"""
+        if self.interpreter is None:
+            infer = self._inference_function()
+            return infer(features_pca.astype(np.float32)).numpy()[:, 0]
+        
+        features_pca = features_pca.astype(np.float32)
+        with self._interpreter_lock:
+            # Reallocate only when the batch size changes
+            if self.interpreter.get_input_details()[0]['shape'][0] != len(features_pca):
+                self.interpreter.resize_tensor_input(self._input_index, features_pca.shape)
+                self.interpreter.allocate_tensors()
+            
+            self.interpreter.set_tensor(self._input_index, features_pca)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output_index)[:, 0]
+    
+    @staticmethod
+    def extract_features(behavioral_data: Dict) -> np.ndarray:
         """
         Extract comprehensive features from behavioral data
         
@@ -181,157 +465,92 @@ class BehavioralBiometricsML:
         Returns:
             Feature vector as numpy array
         """
-        try:
-            features = []
-            
-            # Key press timing features
-            if 'keyEvents' in behavioral_data:
-                key_events = behavioral_data['keyEvents']
-                if len(key_events) > 1:
-                    # Dwell time features
-                    dwell_times = []
-                    for i in range(len(key_events) - 1):
-                        if key_events[i]['event'] == 'pressed' and key_events[i+1]['event'] == 'released':
-                            dwell_time = key_events[i+1]['epoch'] - key_events[i]['epoch']
-                            dwell_times.append(dwell_time)
-                    
-                    if dwell_times:
-                        features.extend([
-                            np.mean(dwell_times),
-                            np.std(dwell_times),
-                            np.min(dwell_times),
-                            np.max(dwell_times),
-                            np.percentile(dwell_times, 25),
-                            np.percentile(dwell_times, 75)
-                        ])
-                    else:
-                        features.extend([0, 0, 0, 0, 0, 0])
-                    
-                    # Flight time features
-                    flight_times = []
-                    for i in range(len(key_events) - 1):
-                        if key_events[i]['event'] == 'released' and key_events[i+1]['event'] == 'pressed':
-                            flight_time = key_events[i+1]['epoch'] - key_events[i]['epoch']
-                            flight_times.append(flight_time)
-                    
-                    if flight_times:
-                        features.extend([
-                            np.mean(flight_times),
-                            np.std(flight_times),
-                            np.min(flight_times),
-                            np.max(flight_times)
-                        ])
-                    else:
-                        features.extend([0, 0, 0, 0])
-                    
-                    # Typing rhythm features
-                    key_press_times = [event['epoch'] for event in key_events if event['event'] == 'pressed']
-                    if len(key_press_times) > 1:
-                        intervals = np.diff(key_press_times)
-                        features.extend([
-                            np.mean(intervals),
-                            np.std(intervals),
-                            np.min(intervals),
-                            np.max(intervals)
-                        ])
-                    else:
-                        features.extend([0, 0, 0, 0])
-                else:
-                    features.extend([0] * 18)  # 18 key-related features
-            else:
-                features.extend([0] * 18)
-            
-            # Touch pattern features
-            if 'touchEvents' in behavioral_data:
-                touch_events = behavioral_data['touchEvents']
-                if len(touch_events) > 1:
-                    # Touch movement patterns
-                    movements = []
-                    for i in range(len(touch_events) - 1):
-                        if touch_events[i]['event'] == 'touch' and touch_events[i+1]['event'] == 'release':
-                            dx = touch_events[i+1]['coordinates']['x'] - touch_events[i]['coordinates']['x']
-                            dy = touch_events[i+1]['coordinates']['y'] - touch_events[i]['coordinates']['y']
-                            distance = np.sqrt(dx**2 + dy**2)
-                            movements.append(distance)
-                    
-                    if movements:
-                        features.extend([
-                            np.mean(movements),
-                            np.std(movements),
-                            np.min(movements),
-                            np.max(movements)
-                        ])
-                    else:
-                        features.extend([0, 0, 0, 0])
-                else:
-                    features.extend([0] * 4)
-            else:
-                features.extend([0] * 4)
-            
-            # Sensor data features
-            if 'sensorData' in behavioral_data:
-                sensor_data = behavioral_data['sensorData']
-                if len(sensor_data) > 1:
-                    # Accelerometer features
-                    acc_x = [s['accelerometer']['x'] for s in sensor_data]
-                    acc_y = [s['accelerometer']['y'] for s in sensor_data]
-                    acc_z = [s['accelerometer']['z'] for s in sensor_data]
-                    
-                    features.extend([
-                        np.mean(acc_x), np.std(acc_x), np.min(acc_x), np.max(acc_x),
-                        np.mean(acc_y), np.std(acc_y), np.min(acc_y), np.max(acc_y),
-                        np.mean(acc_z), np.std(acc_z), np.min(acc_z), np.max(acc_z)
-                    ])
-                    
-                    # Gyroscope features
-                    if 'gyroscope' in sensor_data[0]:
-                        gyro_x = [s['gyroscope']['x'] for s in sensor_data]
-                        gyro_y = [s['gyroscope']['y'] for s in sensor_data]
-                        gyro_z = [s['gyroscope']['z'] for s in sensor_data]
-                        
-                        features.extend([
-                            np.mean(gyro_x), np.std(gyro_x), np.min(gyro_x), np.max(gyro_x),
-                            np.mean(gyro_y), np.std(gyro_y), np.min(gyro_y), np.max(gyro_y),
-                            np.mean(gyro_z), np.std(gyro_z), np.min(gyro_z), np.max(gyro_z)
-                        ])
-                    else:
-                        features.extend([0] * 12)
-                    
-                    # Magnetometer features
-                    if 'magnetometer' in sensor_data[0]:
-                        mag_x = [s['magnetometer']['x'] for s in sensor_data]
-                        mag_y = [s['magnetometer']['y'] for s in sensor_data]
-                        mag_z = [s['magnetometer']['z'] for s in sensor_data]
-                        
-                        features.extend([
-                            np.mean(mag_x), np.std(mag_x), np.min(mag_x), np.max(mag_x),
-                            np.mean(mag_y), np.std(mag_y), np.min(mag_y), np.max(mag_y),
-                            np.mean(mag_z), np.std(mag_z), np.min(mag_z), np.max(mag_z)
-                        ])
-                    else:
-                        features.extend([0] * 12)
-                else:
-                    features.extend([0] * 36)  # 36 sensor-related features
-            else:
-                features.extend([0] * 36)
-            
-            # Session features
-            features.extend([
-                behavioral_data.get('sessionDuration', 0),
-                behavioral_data.get('typingSpeed', 0),
-                behavioral_data.get('falseEnters', 0)
-            ])
-            
-            # Convert to numpy array and handle NaN values
-            features = np.array(features, dtype=np.float64)
-            features = np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
+        return BehavioralBiometricsML.extract_features_and_stats(behavioral_data)[0]
+    
+    @staticmethod
+    def extract_features_and_stats(behavioral_data: Dict) -> Tuple[np.ndarray, Dict]:
+        """
+        Extract features and the summary statistics used for risk indicators in one pass
+        
+        Args:
+            behavioral_data: Dictionary containing behavioral data
             
-            return features
+        Returns:
+            Tuple of the feature vector and a dictionary of statistics
+            (typing_mean_interval, accel_var_max, touch_mean_dist), NaN where unavailable
+        """
+        return feature_kernels.extract_features_and_stats(behavioral_data)
+    
+    def extract_features_batch(self, batch: List[Dict], dtype: type = np.float64) -> np.ndarray:
+        """
+        Extract features for several behavioral data samples at once
+        
+        Args:
+            batch: List of behavioral data dictionaries
+            dtype: Data type of the returned matrix
             
-        except Exception as e:
-            logger.error(f"Error extracting features: {e}")
-            # Return zero features if extraction fails
-            return np.zeros(73)  # Total number of features
+        Returns:
+            Feature matrix of shape (len(batch), FEATURE_DIM)
+        """
+        features = np.empty((len(batch), FEATURE_DIM), dtype=dtype)
+        for i, behavioral_data in enumerate(batch):
+            features[i] = self.extract_features(behavioral_data)
+        
+        return features
+    
+    def _extract_training_features(self, training_data: List[Dict]) -> np.ndarray:
+        """Extract the float32 training feature matrix, reusing cached vectors for samples seen before"""
+        features = np.empty((len(training_data), FEATURE_DIM), dtype=np.float32)
+        keys = [
+            hashlib.blake2b(orjson.dumps(data, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+            for data in training_data
+        ]
+        
+        missing = []
+        with self._feature_cache_lock:
+            for i, key in enumerate(keys):
+                row = self._feature_cache.get(key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    features[i] = row
+                    self._feature_cache.move_to_end(key)
+        
+        # Extraction runs without the lock, so a concurrent training is only held up by cache updates
+        if missing:
+            features[missing] = self._extract_uncached_features([training_data[i] for i in missing])
+            with self._feature_cache_lock:
+                for i in missing:
+                    self._feature_cache[keys[i]] = features[i].copy()
+                while len(self._feature_cache) > FEATURE_CACHE_CAPACITY:
+                    self._feature_cache.popitem(last=False)
+        
+        return features
+    
+    def _extract_uncached_features(self, training_data: List[Dict]) -> np.ndarray:
+        """
+        Extract a float32 feature matrix, spread across worker processes for large training sets
+        """
+        n_workers = os.cpu_count() or 1
+        if n_workers == 1 or len(training_data) < PARALLEL_EXTRACTION_MIN_SAMPLES:
+            return self.extract_features_batch(training_data, dtype=np.float32)
+        
+        # Workers come from a fork server rather than forking this process, whose TensorFlow threads
+        # and locks a plain fork would copy mid-use. They import feature_kernels and re-import the
+        # main script as __mp_main__, which api_server.py keeps free of TensorFlow in that case
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["feature_kernels"])
+        features = np.empty((len(training_data), FEATURE_DIM), dtype=np.float32)
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as executor:
+            rows = executor.map(
+                feature_kernels.extract_features,
+                training_data,
+                chunksize=PARALLEL_EXTRACTION_CHUNK_SIZE
+            )
+            for i, row in enumerate(rows):
+                features[i] = row
+        
+        return features
     
     def train_model(self, training_data: List[Dict], labels: List[int]) -> Dict:
         """
@@ -351,16 +570,11 @@ class BehavioralBiometricsML:
             logger.info("Starting model training...")
             
             # Extract features
-            features = []
-            for data in training_data:
-                feature_vector = self.extract_features(data)
-                features.append(feature_vector)
-            
-            features = np.array(features)
+            features = self._extract_training_features(training_data)
             labels = np.array(labels)
             
-            # Store feature names for later use
-            self.feature_names = [f"feature_{i}" for i in range(features.shape[1])]
+            # Fit fresh models, leaving the current ones serving predictions until they are ready
+            scaler, pca, model, anomaly_detector = self._new_models()
             
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
@@ -368,17 +582,17 @@ class BehavioralBiometricsML:
             )
             
             # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
             
             # Apply PCA
-            X_train_pca = self.pca.fit_transform(X_train_scaled)
-            X_test_pca = self.pca.transform(X_test_scaled)
+            X_train_pca = pca.fit_transform(X_train_scaled)
+            X_test_pca = pca.transform(X_test_scaled)
             
-            logger.info(f"Feature dimensions: Original={features.shape[1]}, PCA={X_train_pca.shape[1]}")
+            logger.info("Feature dimensions: Original=%d, PCA=%d", features.shape[1], X_train_pca.shape[1])
             
             # Train neural network
-            history = self.model.fit(
+            history = model.fit(
                 X_train_pca, y_train,
                 epochs=100,
                 batch_size=32,
@@ -390,11 +604,11 @@ class BehavioralBiometricsML:
                 verbose=1
             )
             
-            # Train isolation forest for anomaly detection
-            self.isolation_forest.fit(X_train_pca)
+            # Fit anomaly detector
+            anomaly_detector.fit(X_train_pca)
             
             # Evaluate model
-            y_pred = self.model.predict(X_test_pca)
+            y_pred = model.predict(X_test_pca)
             y_pred_binary = (y_pred > 0.5).astype(int)
             
             accuracy = accuracy_score(y_test, y_pred_binary)
@@ -403,6 +617,13 @@ class BehavioralBiometricsML:
             report = classification_report(y_test, y_pred_binary, output_dict=True)
             conf_matrix = confusion_matrix(y_test, y_pred_binary)
             
+            # Swap the fitted models in together, so no prediction mixes old and new ones
+            with self._models_lock:
+                self.scaler, self.pca, self.model, self.anomaly_detector = scaler, pca, model, anomaly_detector
+                self.interpreter = None
+                self.feature_names = [f"feature_{i}" for i in range(features.shape[1])]
+                self._cache_transform_params()
+            
             # Save models
             self._save_models()
             
@@ -422,16 +643,16 @@ class BehavioralBiometricsML:
                     "total_features": features.shape[1],
                     "pca_features": X_train_pca.shape[1],
                     "training_samples": len(training_data),
-                    "legitimate_samples": sum(labels),
-                    "fraudulent_samples": len(labels) - sum(labels)
+                    "legitimate_samples": int(labels.sum()),
+                    "fraudulent_samples": int(len(labels) - labels.sum())
                 }
             }
             
-            logger.info(f"Model training completed. Accuracy: {accuracy:.4f}")
+            logger.info("Model training completed. Accuracy: %.4f", accuracy)
             return results
             
         except Exception as e:
-            logger.error(f"Error training model: {e}")
+            logger.exception("Error training model")
             return {"error": str(e)}
     
     def predict(self, behavioral_data: Dict) -> Dict:
@@ -447,47 +668,83 @@ class BehavioralBiometricsML:
         if not ML_AVAILABLE or self.model is None:
             return {"error": "Model not available"}
         
-        try:
-            # Extract features
-            features = self.extract_features(behavioral_data)
-            features = features.reshape(1, -1)
-            
-            # Scale features
-            features_scaled = self.scaler.transform(features)
-            
-            # Apply PCA
-            features_pca = self.pca.transform(features_scaled)
-            
-            # Make prediction
-            prediction_prob = self.model.predict(features_pca)[0][0]
-            prediction = 1 if prediction_prob > 0.5 else 0
-            
-            # Calculate confidence
-            confidence = abs(prediction_prob - 0.5) * 2
-            
-            # Anomaly detection
-            anomaly_score = self.isolation_forest.decision_function(features_pca)[0]
-            is_anomaly = self.isolation_forest.predict(features_pca)[0] == -1
-            
-            # Risk assessment
-            risk_score = self._calculate_risk_score(features_pca[0], prediction_prob, anomaly_score)
+        features = self.extract_features(behavioral_data)
+        return self.predict_batch(features.reshape(1, -1))[0]
+    
+    def predict_async(self, behavioral_data: Dict) -> Future:
+        """
+        Queue behavioral data for a prediction batched with other concurrent calls
+        
+        Args:
+            behavioral_data: Behavioral data dictionary
             
-            results = {
-                "prediction": int(prediction),
-                "prediction_probability": float(prediction_prob),
-                "confidence": float(confidence),
-                "is_anomaly": bool(is_anomaly),
-                "anomaly_score": float(anomaly_score),
-                "risk_score": float(risk_score),
-                "risk_level": self._get_risk_level(risk_score),
-                "timestamp": datetime.now().isoformat()
-            }
+        Returns:
+            Future resolving to the prediction results dictionary
+        """
+        return self._prediction_batcher.submit_async(behavioral_data)
+    
+    def close(self):
+        """Stop the predict_async worker thread, after answering predictions already queued"""
+        self._prediction_batcher.close()
+    
+    def _predict_data_batch(self, batch: List[Dict]) -> List[Dict]:
+        """Extract features and predict for a batch of behavioral data"""
+        return self.predict_batch(self.extract_features_batch(batch))
+    
+    def predict_batch(self, features: np.ndarray) -> List[Dict]:
+        """
+        Make predictions on a batch of extracted feature vectors
+        
+        Args:
+            features: Feature matrix of shape (batch_size, FEATURE_DIM)
             
-            return results
+        Returns:
+            List of prediction results dictionaries, one per row
+        """
+        try:
+            with self._models_lock:
+                if not ML_AVAILABLE or self.model is None:
+                    return [{"error": "Model not available"}] * len(features)
+                
+                # Scale features and apply PCA
+                features_pca = self._transform(features)
+                
+                # Make predictions for the whole batch in one call
+                prediction_probs = self._predict_probabilities(features_pca)
+                
+                # Anomaly detection
+                anomaly_scores = self.anomaly_detector.decision_function(features_pca)
+                anomalies = anomaly_scores < 0
+                
+                results = []
+                timestamp = datetime.now().isoformat()
+                for row, prediction_prob, anomaly_score, is_anomaly in zip(
+                    features_pca, prediction_probs, anomaly_scores, anomalies
+                ):
+                    prediction = 1 if prediction_prob > 0.5 else 0
+                    
+                    # Calculate confidence
+                    confidence = abs(prediction_prob - 0.5) * 2
+                    
+                    # Risk assessment
+                    risk_score = self._calculate_risk_score(row, prediction_prob, anomaly_score)
+                    
+                    results.append({
+                        "prediction": int(prediction),
+                        "prediction_probability": float(prediction_prob),
+                        "confidence": float(confidence),
+                        "is_anomaly": bool(is_anomaly),
+                        "anomaly_score": float(anomaly_score),
+                        "risk_score": float(risk_score),
+                        "risk_level": self._get_risk_level(risk_score),
+                        "timestamp": timestamp
+                    })
+                
+                return results
             
         except Exception as e:
-            logger.error(f"Error making prediction: {e}")
-            return {"error": str(e)}
+            logger.exception("Error making prediction")
+            return [{"error": str(e)}] * len(features)
     
     def _calculate_risk_score(self, features: np.ndarray, prediction_prob: float, anomaly_score: float) -> float:
         """Calculate comprehensive risk score"""
@@ -497,8 +754,9 @@ class BehavioralBiometricsML:
         if prediction_prob < 0.3 or prediction_prob > 0.7:
             risk_score += 0.3
         
-        # Anomaly risk
-        if anomaly_score < -0.5:  # High anomaly
+        # Anomaly risk: high when the score is as extreme as the rarest training samples
+        high_anomaly_score = getattr(self.anomaly_detector, 'high_anomaly_score_', LEGACY_HIGH_ANOMALY_SCORE)
+        if anomaly_score < high_anomaly_score:
             risk_score += 0.4
         
         # Feature variance risk
@@ -524,22 +782,20 @@ class BehavioralBiometricsML:
         
         try:
             # For neural networks, we can use the weights of the first layer
+            # (get_weights returns a copy, so abs can run in place before the row-sum reduction)
             first_layer_weights = self.model.layers[0].get_weights()[0]
-            feature_importance = np.mean(np.abs(first_layer_weights), axis=1)
-            
-            # Map to feature names
-            importance_dict = {}
-            for i, importance in enumerate(feature_importance):
-                feature_name = self.feature_names[i] if self.feature_names else f"feature_{i}"
-                importance_dict[feature_name] = float(importance)
-            
-            # Sort by importance
-            sorted_importance = dict(sorted(importance_dict.items(), key=lambda x: x[1], reverse=True))
-            
-            return sorted_importance
+            np.abs(first_layer_weights, out=first_layer_weights)
+            feature_importance = np.einsum('ij->i', first_layer_weights) / first_layer_weights.shape[1]
+            
+            # Map to feature names, most important first (ties keep their original order)
+            order = np.argsort(-feature_importance, kind='stable')
+            return {
+                (self.feature_names[i] if self.feature_names else f"feature_{i}"): float(feature_importance[i])
+                for i in order
+            }
             
         except Exception as e:
-            logger.error(f"Error getting feature importance: {e}")
+            logger.exception("Error getting feature importance")
             return {}
     
     def get_model_info(self) -> Dict:
@@ -551,34 +807,46 @@ class BehavioralBiometricsML:
             "model_loaded": self.model is not None,
             "scaler_loaded": self.scaler is not None,
             "pca_loaded": self.pca is not None,
-            "isolation_forest_loaded": self.isolation_forest is not None,
+            "anomaly_detector_loaded": self.anomaly_detector is not None,
             "feature_names": self.feature_names,
             "model_directory": self.model_dir
         }
         
-        if self.model:
+        if self.model and self.model.built:
             info["model_summary"] = []
             self.model.summary(print_fn=lambda x: info["model_summary"].append(x))
         
         return info
     
-    def reset_model(self):
-        """Reset all models"""
+    def _clear_models(self):
+        """Drop every in-memory model"""
         self.scaler = None
         self.pca = None
         self.model = None
-        self.isolation_forest = None
+        self.interpreter = None
+        self.anomaly_detector = None
         self.feature_names = None
+        self._cache_transform_params()
+        with self._feature_cache_lock:
+            self._feature_cache.clear()
+    
+    def reset_model(self):
+        """Reset all models"""
+        with self._models_lock:
+            self._clear_models()
         
-        # Remove saved model files
-        try:
-            for file in os.listdir(self.model_dir):
-                file_path = os.path.join(self.model_dir, file)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-            logger.info("Models reset successfully")
-        except Exception as e:
-            logger.error(f"Error resetting models: {e}")
+        # Remove saved model files, keeping the files other processes coordinate through
+        with self._model_dir_lock(exclusive=True):
+            try:
+                for file in os.listdir(self.model_dir):
+                    file_path = os.path.join(self.model_dir, file)
+                    if os.path.isfile(file_path) and file not in (MODEL_GENERATION_FILE, MODEL_LOCK_FILE):
+                        os.remove(file_path)
+                logger.info("Models reset successfully")
+            except Exception as e:
+                logger.exception("Error resetting models")
+            finally:
+                self._mark_models_changed()
 
 # Example usage and testing
 if __name__ == "__main__":
@@ -612,6 +880,6 @@ if __name__ == "__main__":
     
     # Test model info
     model_info = ml_service.get_model_info()
-    print("Model info:", json.dumps(model_info, indent=2))
+    print("Model info:", orjson.dumps(model_info, option=orjson.OPT_INDENT_2).decode())
     
     print("ML Backend Service initialized successfully!")
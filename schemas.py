@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Request Schemas for the Behavioral Authentication ML API
+msgspec validates request bodies against these while decoding them into plain dicts
+"""
+
+from typing import List, TypedDict
+
+
+class Vector3(TypedDict):
+    """A three-axis sensor reading"""
+    x: float
+    y: float
+    z: float
+
+
+class Coordinates(TypedDict):
+    """A screen position"""
+    x: float
+    y: float
+
+
+class KeyEvent(TypedDict):
+    """A key press or release"""
+    event: str
+    epoch: float
+
+
+class TouchEvent(TypedDict):
+    """A touch or release at a screen position"""
+    event: str
+    coordinates: Coordinates
+
+
+class _SensorSampleBase(TypedDict):
+    accelerometer: Vector3
+
+
+class SensorSample(_SensorSampleBase, total=False):
+    """A single sensor sample; gyroscope and magnetometer are optional"""
+    gyroscope: Vector3
+    magnetometer: Vector3
+
+
+class BehavioralData(TypedDict, total=False):
+    """Behavioral data collected during one session"""
+    keyEvents: List[KeyEvent]
+    touchEvents: List[TouchEvent]
+    sensorData: List[SensorSample]
+    sessionDuration: float
+    typingSpeed: float
+    falseEnters: float
+
+
+class BehavioralDataRequest(TypedDict):
+    """Body of the predict, feature extraction and risk assessment endpoints"""
+    behavioral_data: BehavioralData
+
+
+class TrainRequest(TypedDict):
+    """Body of the model training endpoint"""
+    training_data: List[BehavioralData]
+    labels: List[int]
@@ -50,8 +50,8 @@ echo "   API Server will be available at: http://localhost:5000"
 echo "   Press Ctrl+C to stop the backend"
 echo ""
 
-# Start Python backend in background
-python api_server.py &
+# Start Python backend in background (one gunicorn worker per core)
+gunicorn -c gunicorn.conf.py api_server:app &
 BACKEND_PID=$!
 
 # Wait a moment for backend to start
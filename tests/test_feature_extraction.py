@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Feature Extraction Regression Tests
+Checks the Numba feature extractor against the original per-sample Python implementation
+
+Run from the repository root with: python -m pytest tests/ (or python -m unittest discover tests)
+"""
+
+import random
+import unittest
+
+import numpy as np
+
+from feature_kernels import FEATURE_DIM, extract_features
+
+# Key features the reference pads with when a session has fewer than two key events
+# (18 zeros, where a session with key events gets 14 key features)
+REFERENCE_EMPTY_KEY_WIDTH = 18
+KEY_WIDTH = 14
+
+
+def reference_features(behavioral_data):
+    """The feature vector as the original loop-based extract_features built it"""
+    features = []
+
+    key_events = behavioral_data.get('keyEvents')
+    if key_events is not None and len(key_events) > 1:
+        dwell_times = [
+            key_events[i + 1]['epoch'] - key_events[i]['epoch']
+            for i in range(len(key_events) - 1)
+            if key_events[i]['event'] == 'pressed' and key_events[i + 1]['event'] == 'released'
+        ]
+        if dwell_times:
+            features.extend([
+                np.mean(dwell_times), np.std(dwell_times), np.min(dwell_times), np.max(dwell_times),
+                np.percentile(dwell_times, 25), np.percentile(dwell_times, 75)
+            ])
+        else:
+            features.extend([0] * 6)
+
+        flight_times = [
+            key_events[i + 1]['epoch'] - key_events[i]['epoch']
+            for i in range(len(key_events) - 1)
+            if key_events[i]['event'] == 'released' and key_events[i + 1]['event'] == 'pressed'
+        ]
+        if flight_times:
+            features.extend([np.mean(flight_times), np.std(flight_times), np.min(flight_times), np.max(flight_times)])
+        else:
+            features.extend([0] * 4)
+
+        key_press_times = [event['epoch'] for event in key_events if event['event'] == 'pressed']
+        if len(key_press_times) > 1:
+            intervals = np.diff(key_press_times)
+            features.extend([np.mean(intervals), np.std(intervals), np.min(intervals), np.max(intervals)])
+        else:
+            features.extend([0] * 4)
+    else:
+        features.extend([0] * REFERENCE_EMPTY_KEY_WIDTH)
+
+    touch_events = behavioral_data.get('touchEvents')
+    if touch_events is not None and len(touch_events) > 1:
+        movements = []
+        for i in range(len(touch_events) - 1):
+            if touch_events[i]['event'] == 'touch' and touch_events[i + 1]['event'] == 'release':
+                dx = touch_events[i + 1]['coordinates']['x'] - touch_events[i]['coordinates']['x']
+                dy = touch_events[i + 1]['coordinates']['y'] - touch_events[i]['coordinates']['y']
+                movements.append(np.sqrt(dx ** 2 + dy ** 2))
+        if movements:
+            features.extend([np.mean(movements), np.std(movements), np.min(movements), np.max(movements)])
+        else:
+            features.extend([0] * 4)
+    else:
+        features.extend([0] * 4)
+
+    sensor_data = behavioral_data.get('sensorData')
+    if sensor_data is not None and len(sensor_data) > 1:
+        for sensor in ('accelerometer', 'gyroscope', 'magnetometer'):
+            if sensor == 'accelerometer' or sensor in sensor_data[0]:
+                for axis in ('x', 'y', 'z'):
+                    values = [s[sensor][axis] for s in sensor_data]
+                    features.extend([np.mean(values), np.std(values), np.min(values), np.max(values)])
+            else:
+                features.extend([0] * 12)
+    else:
+        features.extend([0] * 36)
+
+    features.extend([
+        behavioral_data.get('sessionDuration', 0),
+        behavioral_data.get('typingSpeed', 0),
+        behavioral_data.get('falseEnters', 0)
+    ])
+
+    features = np.nan_to_num(np.array(features, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+
+    # The only intended difference: a session without key features now has 14 key zeros, not 18
+    if features.shape[0] == FEATURE_DIM + REFERENCE_EMPTY_KEY_WIDTH - KEY_WIDTH:
+        features = np.delete(features, np.s_[KEY_WIDTH:REFERENCE_EMPTY_KEY_WIDTH])
+    return features
+
+
+def random_session(rng):
+    """A random session, with some feature groups short, empty or missing"""
+    session = {}
+
+    if rng.random() < 0.9:
+        t = rng.randint(0, 10 ** 12)
+        key_events = []
+        for _ in range(rng.choice([0, 1, 2, 3, rng.randint(4, 80)])):
+            t += rng.randint(0, 500)
+            event = rng.choices(['pressed', 'released', 'held', 'unknown'], weights=[10, 10, 1, 1])[0]
+            key_events.append({"key": "a", "event": event, "epoch": t, "inputBox": "name"})
+        session['keyEvents'] = key_events
+
+    if rng.random() < 0.9:
+        touch_events = []
+        for _ in range(rng.choice([0, 1, 2, rng.randint(3, 30)])):
+            event = rng.choices(['touch', 'release', 'move'], weights=[10, 10, 1])[0]
+            coordinates = {"x": rng.uniform(0, 400), "y": rng.randint(0, 800)}
+            touch_events.append({"event": event, "coordinates": coordinates, "epoch": 0})
+        session['touchEvents'] = touch_events
+
+    if rng.random() < 0.9:
+        sensors = ['accelerometer'] + [name for name in ('gyroscope', 'magnetometer') if rng.random() < 0.6]
+        session['sensorData'] = [
+            {name: {axis: rng.gauss(0, 5) for axis in ('x', 'y', 'z')} for name in sensors}
+            for _ in range(rng.choice([0, 1, 2, rng.randint(3, 60)]))
+        ]
+
+    for field, value in (('sessionDuration', rng.randint(0, 60000)), ('typingSpeed', rng.uniform(0, 5)),
+                         ('falseEnters', rng.randint(0, 5))):
+        if rng.random() < 0.8:
+            session[field] = value
+
+    return session
+
+
+def key_event(event, epoch):
+    """A key event for the first key of the session"""
+    return {"key": "a", "event": event, "epoch": epoch}
+
+
+class FeatureExtractionTest(unittest.TestCase):
+    """extract_features must reproduce the reference features, apart from the key padding width"""
+
+    def assert_matches_reference(self, session):
+        features = extract_features(session)
+        self.assertEqual(features.shape, (FEATURE_DIM,))
+        np.testing.assert_allclose(features, reference_features(session), rtol=1e-9, atol=1e-6)
+
+    def test_random_sessions(self):
+        rng = random.Random(20240611)
+        for i in range(500):
+            session = random_session(rng)
+            with self.subTest(session=i):
+                self.assert_matches_reference(session)
+
+    def test_empty_session(self):
+        self.assert_matches_reference({})
+
+    def test_no_key_events(self):
+        self.assert_matches_reference({"keyEvents": [], "sessionDuration": 1200})
+        self.assert_matches_reference({"keyEvents": [key_event('pressed', 5)]})
+
+    def test_single_dwell(self):
+        session = {"keyEvents": [key_event('pressed', 100), key_event('released', 180)]}
+        self.assert_matches_reference(session)
+        self.assertEqual(list(extract_features(session)[:6]), [80, 0, 80, 80, 80, 80])
+
+    def test_unknown_event_names(self):
+        self.assert_matches_reference({
+            "keyEvents": [key_event('pressed', 0), key_event('repeat', 40), key_event('released', 90),
+                          key_event('pressed', 200), key_event('released', 260)],
+            "touchEvents": [{"event": "touch", "coordinates": {"x": 0, "y": 0}},
+                            {"event": "hover", "coordinates": {"x": 3, "y": 4}},
+                            {"event": "release", "coordinates": {"x": 6, "y": 8}}]
+        })
+
+    def test_missing_gyroscope(self):
+        rng = random.Random(7)
+        sensor_data = [
+            {"accelerometer": {axis: rng.gauss(0, 1) for axis in 'xyz'},
+             "magnetometer": {axis: rng.gauss(30, 2) for axis in 'xyz'}}
+            for _ in range(20)
+        ]
+        self.assert_matches_reference({"sensorData": sensor_data})
+        features = extract_features({"sensorData": sensor_data})
+        self.assertTrue(np.all(features[30:42] == 0))
+        self.assertTrue(np.all(features[42:54] != 0))
+
+
+if __name__ == '__main__':
+    unittest.main()